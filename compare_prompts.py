@@ -4,7 +4,24 @@ Demonstrates iterative prompt improvement
 """
 
 import os
-from rag_system import DocumentProcessor, RAGPipeline
+import re
+import asyncio
+from rag_system import DocumentProcessor, RAGPipeline, load_or_build_index
+
+# Shared with demo.py, so answers cached by either script are reused
+SEMANTIC_CACHE_PATH = ".rag_cache/semantic_cache.sqlite3"
+ANSWER_CACHE_DIR = ".rag_cache/answers"
+
+# Every case-sensitive marker the analysis looks for, matched in a single pass over an answer
+ANSWER_MARKERS = re.compile(r"Page|Excerpt|\*\*|Confidence:")
+
+# Any mention of confidence, matched case-insensitively without lowercasing a copy
+CONFIDENCE_MENTION = re.compile(r"confidence", re.IGNORECASE)
+
+
+def find_markers(answer: str) -> set:
+    """Return the set of analysis markers present in an answer"""
+    return set(ANSWER_MARKERS.findall(answer))
 
 
 def compare_prompts(pdf_path: str):
@@ -14,14 +31,13 @@ def compare_prompts(pdf_path: str):
         print(f"PDF not found: {pdf_path}")
         return
     
-    # Load documents
+    # Initialize RAG and load documents (cached on disk between runs)
     processor = DocumentProcessor(chunk_size=500, overlap=100)
-    text = processor.load_pdf(pdf_path)
-    chunks = processor.chunk_text(text)
-    
-    # Initialize RAG
     rag = RAGPipeline()
-    rag.add_documents(chunks)
+    rag.enable_answer_cache(ANSWER_CACHE_DIR)
+    load_or_build_index(pdf_path, processor, rag)
+    # Enabled after loading so only answers about this version of the PDF are reused
+    rag.enable_semantic_cache(cache_path=SEMANTIC_CACHE_PATH)
     
     # Test questions
     test_questions = [
@@ -35,15 +51,24 @@ def compare_prompts(pdf_path: str):
     print("PROMPT COMPARISON: V1 vs V2")
     print("="*80)
     
-    for i, question in enumerate(test_questions, 1):
+    # Run the V1 and V2 batches concurrently so LLM round-trips overlap
+    # (both share the retrieval cache, so each question is searched once, and
+    # one semaphore, so at most LLM_CONCURRENCY calls are in flight in total)
+    async def run_all():
+        semaphore = asyncio.Semaphore(rag.LLM_CONCURRENCY)
+        return await asyncio.gather(
+            rag.answer_questions_batch(test_questions, prompt_version=1, semaphore=semaphore),
+            rag.answer_questions_batch(test_questions, prompt_version=2, semaphore=semaphore)
+        )
+    
+    responses_v1, responses_v2 = asyncio.run(run_all())
+    paired_responses = zip(responses_v1, responses_v2)
+    
+    for i, (question, (response_v1, response_v2)) in enumerate(zip(test_questions, paired_responses), 1):
         print(f"\n{'='*80}")
         print(f"Question {i}: {question}")
         print(f"{'='*80}")
         
-        # Get answers from both versions
-        response_v1 = rag.answer_question(question, prompt_version=1)
-        response_v2 = rag.answer_question(question, prompt_version=2)
-        
         # Compare
         print("\n📝 PROMPT V1 (Basic):")
         print("-" * 80)
@@ -57,14 +82,17 @@ def compare_prompts(pdf_path: str):
         print("\n📊 Analysis:")
         print("-" * 80)
         
-        v1_has_citations = "Page" in response_v1['answer']
-        v2_has_citations = "Page" in response_v2['answer'] or "Excerpt" in response_v2['answer']
+        v1_markers = find_markers(response_v1['answer'])
+        v2_markers = find_markers(response_v2['answer'])
+        
+        v1_has_citations = "Page" in v1_markers
+        v2_has_citations = "Page" in v2_markers or "Excerpt" in v2_markers
         
-        v1_has_confidence = "confidence" in response_v1['answer'].lower()
-        v2_has_confidence = "Confidence:" in response_v2['answer']
+        v1_has_confidence = bool(CONFIDENCE_MENTION.search(response_v1['answer']))
+        v2_has_confidence = "Confidence:" in v2_markers
         
-        v1_structured = "**" in response_v1['answer']
-        v2_structured = "**" in response_v2['answer']
+        v1_structured = "**" in v1_markers
+        v2_structured = "**" in v2_markers
         
         print(f"Citations:        V1: {'✓' if v1_has_citations else '✗'}  |  V2: {'✓' if v2_has_citations else '✗'}")
         print(f"Confidence:       V1: {'✓' if v1_has_confidence else '✗'}  |  V2: {'✓' if v2_has_confidence else '✗'}")
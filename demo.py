@@ -5,7 +5,38 @@ env_path = Path(__file__).parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
 import os
-from rag_system import DocumentProcessor, RAGPipeline, Evaluator
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from rag_system import DocumentProcessor, RAGPipeline, Evaluator, load_or_build_index, available_cpus
+
+# Optional: line editing and history for the interactive loop (falls back to input())
+try:
+    from prompt_toolkit import PromptSession
+except ImportError:
+    PromptSession = None
+
+# Answers to earlier (and paraphrased) questions are reused across runs
+SEMANTIC_CACHE_PATH = ".rag_cache/semantic_cache.sqlite3"
+ANSWER_CACHE_DIR = ".rag_cache/answers"
+
+# Set RAG_EVAL_WORKERS=N to evaluate with N worker processes (synchronous Groq
+# client) instead of concurrent async calls
+EVAL_WORKERS = int(os.getenv("RAG_EVAL_WORKERS", "0"))
+
+# Per-process pipeline used by evaluation workers
+_worker_rag = None
+
+
+def _init_worker(pdf_path: str, num_threads: int):
+    """Warm one RAGPipeline per worker from the on-disk index cache"""
+    global _worker_rag
+    _worker_rag = RAGPipeline(model_name="all-MiniLM-L6-v2", num_threads=num_threads)
+    load_or_build_index(pdf_path, DocumentProcessor(chunk_size=500, overlap=100), _worker_rag)
+
+
+def _answer_one(qa: dict) -> dict:
+    """Answer one evaluation question in a worker process"""
+    return _worker_rag.answer_question(qa["query"], top_k=3, prompt_version=2)
 
 
 def main():
@@ -31,24 +62,20 @@ def main():
     print("Using Groq API (llama-3.1-8b-instant)")
     print("="*80)
     
-    # Step 1: Process documents
-    print("\n📄 Step 1: Loading and processing documents...")
-    processor = DocumentProcessor(chunk_size=500, overlap=100)
-    
-    # Load PDF
-    text = processor.load_pdf(pdf_path)
-    print(f"   Loaded {len(text)} characters from PDF")
+    # Step 1: Initialize RAG pipeline
+    print("\n🔧 Step 1: Initializing RAG pipeline...")
+    rag = RAGPipeline(model_name="all-MiniLM-L6-v2")
+    rag.enable_answer_cache(ANSWER_CACHE_DIR)
     
-    # Chunk text
-    documents = processor.chunk_text(text, source=pdf_path)
-    print(f"   Created {len(documents)} chunks")
+    # Step 2: Process documents (reused from the on-disk cache when the PDF is unchanged)
+    print("\n📄 Step 2: Loading and processing documents...")
+    processor = DocumentProcessor(chunk_size=500, overlap=100)
+    num_chunks = load_or_build_index(pdf_path, processor, rag)
+    # Enabled after loading so only answers about this version of the PDF are reused
+    rag.enable_semantic_cache(cache_path=SEMANTIC_CACHE_PATH)
+    print(f"   {num_chunks} chunks in the index")
     print(f"   Chunk size: {processor.chunk_size} chars with {processor.overlap} overlap")
     
-    # Step 2: Initialize RAG pipeline
-    print("\n🔧 Step 2: Initializing RAG pipeline...")
-    rag = RAGPipeline(model_name="all-MiniLM-L6-v2")
-    rag.add_documents(documents)
-    
     # Step 3: Run evaluation
     print("\n📊 Step 3: Running evaluation...")
     evaluator = Evaluator()
@@ -104,15 +131,25 @@ def main():
     print(f"\n   🔍 Testing with Improved Prompt (V2)")
     print("   " + "-"*76)
     
-    for i, qa in enumerate(evaluation_questions, 1):
+    if EVAL_WORKERS > 0:
+        # Answer questions in parallel worker processes, each with its own warmed pipeline
+        # (cores are split between workers so their thread pools don't oversubscribe the CPU)
+        workers = min(EVAL_WORKERS, len(evaluation_questions), available_cpus())
+        threads_per_worker = max(1, available_cpus() // workers)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(pdf_path, threads_per_worker)) as executor:
+            responses = list(executor.map(_answer_one, evaluation_questions))
+    else:
+        # Retrieve for all questions in one batch, then overlap the Groq round-trips
+        queries = [qa["query"] for qa in evaluation_questions]
+        responses = asyncio.run(rag.answer_questions_batch(queries, top_k=3, prompt_version=2))
+    
+    for i, (qa, response) in enumerate(zip(evaluation_questions, responses), 1):
         query = qa["query"]
         
         print(f"\n   Q{i}: {query}")
         print(f"   Category: {qa['category']}")
         
-        # Get answer
-        response = rag.answer_question(query, top_k=3, prompt_version=2)
-        
         print(f"   Confidence: {response['confidence']}")
         
         # Show answer (truncated)
@@ -141,10 +178,17 @@ def main():
     print()
     
     # Interactive loop
+    interactive_loop(rag)
+
+
+def interactive_loop(rag: RAGPipeline):
+    """Answer questions typed by the user until they quit"""
+    read_question = PromptSession().prompt if PromptSession is not None else input
+    
     while True:
         try:
             # Get user input
-            query = input("❓ Your question: ").strip()
+            query = read_question("❓ Your question: ").strip()
             
             # Check for exit commands
             if query.lower() in ['quit', 'exit', 'q']:
@@ -158,11 +202,14 @@ def main():
             
             # Get answer using v2 prompt (improved)
             print("\n🔍 Searching policy documents...")
-            response = rag.answer_question(query, top_k=3, prompt_version=2)
+            response, tokens = rag.stream_answer(query, top_k=3, prompt_version=2)
             
+            # Print the answer as it streams in
             print("\n💡 Answer:")
             print("-" * 80)
-            print(response['answer'])
+            for token in tokens:
+                print(token, end="", flush=True)
+            print()
             print("-" * 80)
             
             print(f"\n📚 Retrieved {len(response['context'])} relevant excerpts:")
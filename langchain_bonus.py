@@ -13,6 +13,41 @@ from langchain.schema import Document as LangChainDocument
 from langchain.vectorstores import FAISS
 from langchain.embeddings import HuggingFaceEmbeddings
 
+# Prompt template (V2 style), defined once at import
+QA_TEMPLATE = '''You are a precise policy assistant. Answer questions using ONLY the provided excerpts.
+
+<policy_excerpts>
+{context}
+</policy_excerpts>
+
+<question>
+{question}
+</question>
+
+<instructions>
+1. CAREFULLY read all excerpts
+2. ONLY use information explicitly stated in the excerpts
+3. If the answer requires information not in the excerpts, state this clearly
+4. Cite the excerpt ID and page number for each piece of information
+5. Use the structured format below
+</instructions>
+
+<output_format>
+**Policy Answer:**
+[Your answer here, with citations like (Page X)]
+
+**Confidence:** [High/Medium/Low]
+- High: Answer fully supported by excerpts
+- Medium: Partial information available
+- Low: Insufficient information
+
+**Source:** [List page numbers used]
+
+**Note:** [Any important caveats or missing information]
+</output_format>
+
+Please answer the question now:'''
+
 class LangChainRAG:
     '''
     Enhanced RAG using LangChain for:
@@ -36,6 +71,9 @@ class LangChainRAG:
         # Vector store (will be populated)
         self.vectorstore = None
         
+        # Build the QA chain once and reuse it for every question
+        self.qa_chain = self.create_qa_chain()
+        
     def add_documents(self, documents):
         '''Add documents to vector store'''
         # Convert to LangChain format
@@ -60,44 +98,9 @@ class LangChainRAG:
     def create_qa_chain(self):
         '''Create a question-answering chain'''
         
-        # Define prompt template (V2 style)
-        template = '''You are a precise policy assistant. Answer questions using ONLY the provided excerpts.
-
-<policy_excerpts>
-{context}
-</policy_excerpts>
-
-<question>
-{question}
-</question>
-
-<instructions>
-1. CAREFULLY read all excerpts
-2. ONLY use information explicitly stated in the excerpts
-3. If the answer requires information not in the excerpts, state this clearly
-4. Cite the excerpt ID and page number for each piece of information
-5. Use the structured format below
-</instructions>
-
-<output_format>
-**Policy Answer:**
-[Your answer here, with citations like (Page X)]
-
-**Confidence:** [High/Medium/Low]
-- High: Answer fully supported by excerpts
-- Medium: Partial information available
-- Low: Insufficient information
-
-**Source:** [List page numbers used]
-
-**Note:** [Any important caveats or missing information]
-</output_format>
-
-Please answer the question now:'''
-        
         prompt = PromptTemplate(
             input_variables=["context", "question"],
-            template=template
+            template=QA_TEMPLATE
         )
         
         # Create chain
@@ -121,8 +124,7 @@ Please answer the question now:'''
         ])
         
         # Run chain
-        chain = self.create_qa_chain()
-        response = chain.run(context=context, question=query)
+        response = self.qa_chain.run(context=context, question=query)
         
         return {
             "answer": response,
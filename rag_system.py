@@ -6,17 +6,33 @@ Using Groq API (llama-3.1-8b-instant)
 
 import os
 import json
+import math
 import re
-from typing import List, Dict, Tuple
+import asyncio
+import sqlite3
+import hashlib
+from typing import List, Dict, Tuple, Optional, Iterator, Iterable, Generator
 from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 import numpy as np
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
+
+# Idle OpenMP workers (FAISS, PyTorch) sleep instead of spin-waiting, so the two
+# thread pools don't steal each other's cores. Only read when the libraries load
+os.environ.setdefault("OMP_WAIT_POLICY", "PASSIVE")
+
+# For PDF processing (PyMuPDF's C text extractor when installed, PyPDF2 otherwise)
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
 
-# For PDF processing
 try:
     import PyPDF2
 except ImportError:
-    print("PyPDF2 not installed. Install with: pip install PyPDF2")
+    if pymupdf is None:
+        print("PyPDF2 not installed. Install with: pip install PyPDF2 (or pymupdf for faster extraction)")
 
 # For embeddings and vector storage
 try:
@@ -29,13 +45,99 @@ try:
 except ImportError:
     print("faiss not installed. Install with: pip install faiss-cpu")
 
+# Optional: used to detect a CUDA device and size the CPU thread pool (installed with sentence-transformers)
+try:
+    import torch
+except ImportError:
+    torch = None
+
+# Optional: on-disk cache of LLM answers (see RAGPipeline.enable_answer_cache)
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+# Optional: faster JSON serialization for evaluation results
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Optional: int8 ONNX Runtime embedding backend (see OnnxEmbedder)
+try:
+    import onnxruntime
+    from transformers import AutoTokenizer
+except ImportError:
+    onnxruntime = None
+
 # For LLM - Groq only
 try:
-    from groq import Groq
+    from groq import Groq, AsyncGroq, APIConnectionError
+    import httpx
 except ImportError:
     print("groq not installed. Install with: pip install groq")
 
 
+# Fixed V2 instructions, sent as the system message so every request shares an
+# identical prefix that the provider can cache
+SYSTEM_PROMPT_V2 = """You are a precise policy assistant. Your task is to answer questions about company policies using ONLY the provided excerpts.
+
+<instructions>
+1. CAREFULLY read all excerpts
+2. ONLY use information explicitly stated in the excerpts
+3. If the answer requires information not in the excerpts, state this clearly
+4. Cite the excerpt ID and page number for each piece of information
+5. Use the structured format below
+</instructions>
+
+<output_format>
+**Policy Answer:**
+[Your answer here, with citations like (Excerpt 1, Page 5)]
+
+**Confidence:** [High/Medium/Low]
+- High: Answer fully supported by excerpts
+- Medium: Partial information available
+- Low: Insufficient information
+
+**Source:** [List excerpt IDs and page numbers used]
+
+**Note:** [Any important caveats or missing information]
+</output_format>"""
+
+
+# Prompt templates, defined once at import and filled per call with format_map
+# (the V2 template is the user message that follows SYSTEM_PROMPT_V2)
+PROMPT_V1 = """You are a helpful assistant answering questions about company policies.
+
+Context from policy documents:
+{context}
+
+Question: {query}
+
+Instructions:
+- Answer the question using ONLY the information provided in the context above
+- If the context doesn't contain the answer, say "I don't have enough information to answer this question"
+- Be concise and accurate
+
+Answer:"""
+
+PROMPT_V2 = """<policy_excerpts>
+{context}
+</policy_excerpts>
+
+<question>
+{query}
+</question>
+
+Please answer the question now:"""
+
+# How each retrieved chunk is labelled inside {context}, per prompt version
+EXCERPT_TEMPLATES = {
+    1: "[Excerpt {id} from Page {page}]:\n{text}",
+    2: "<excerpt id=\"{id}\" page=\"{page}\">\n{text}\n</excerpt>",
+}
+
+
 @dataclass
 class Document:
     """Represents a text chunk with metadata"""
@@ -45,9 +147,119 @@ class Document:
     source: str
 
 
+class _LRUCache:
+    """Small bounded mapping that evicts the least recently used entry"""
+    
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+    
+    def get(self, key, default=None):
+        if key not in self._data:
+            return default
+        self._data.move_to_end(key)
+        return self._data[key]
+    
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+    
+    def clear(self):
+        self._data.clear()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# Embedding models and sync Groq clients shared by all RAGPipeline instances in
+# the process, keyed by (model name or ONNX dir, device) and by API key
+_MODEL_CACHE: Dict[Tuple[str, Optional[str]], object] = {}
+_GROQ_CLIENTS: Dict[str, "Groq"] = {}
+
+
+# Thread count the process-wide PyTorch/FAISS pools were last sized to (None: never)
+_NUM_THREADS: Optional[int] = None
+
+
+def available_cpus() -> int:
+    """CPUs this process may run on (respects affinity masks and cpusets, unlike os.cpu_count)"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _set_num_threads(num_threads: int):
+    """Size the PyTorch and FAISS CPU thread pools explicitly"""
+    global _NUM_THREADS
+    _NUM_THREADS = num_threads
+    if torch is not None:
+        torch.set_num_threads(num_threads)
+        try:
+            torch.set_num_interop_threads(max(1, num_threads // 4))
+        except RuntimeError:
+            # Only settable once, before PyTorch starts any inter-op work
+            pass
+    faiss.omp_set_num_threads(num_threads)
+
+
+def _extract_page_range(pdf_path: str, start: int, stop: int) -> List[str]:
+    """Extract the text of pages [start, stop) with PyMuPDF (runs in a worker process)"""
+    with pymupdf.open(pdf_path) as pdf_document:
+        return [pdf_document[page_index].get_text("text") for page_index in range(start, stop)]
+
+
+# clean_text patterns, compiled once
+_WHITESPACE_RE = re.compile(r'\s+')
+_SPECIAL_CHARS_RE = re.compile(r'[^\w\s.,!?;:()\-\[\]]')
+# str.translate table deleting exactly the ASCII characters _SPECIAL_CHARS_RE matches
+_ASCII_SPECIAL_CHARS = {code: None for code in range(128) if _SPECIAL_CHARS_RE.match(chr(code))}
+
+
+def _batched(items: Iterable, size: int) -> Iterator[List]:
+    """Group an iterable into lists of at most `size` items"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _collect(stream: Generator, parts: List) -> Generator:
+    """Re-yield a generator's items while appending them to `parts`; returns its return value"""
+    while True:
+        try:
+            item = next(stream)
+        except StopIteration as stop:
+            return stop.value
+        parts.append(item)
+        yield item
+
+
+def _top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first (partial sort instead of a full argsort)"""
+    if k < len(scores):
+        top = np.argpartition(-scores, k)[:k]
+    else:
+        top = np.arange(len(scores))
+    return top[np.argsort(-scores[top])]
+
+
 class DocumentProcessor:
     """Handles PDF loading and text chunking"""
     
+    # Windows shorter than this are merged into the preceding chunk
+    MIN_CHUNK_SIZE = 50
+    
+    # PDFs with at least this many pages are extracted by up to EXTRACT_WORKERS
+    # processes (PyMuPDF holds the GIL and documents can't be shared across threads)
+    PARALLEL_EXTRACT_MIN_PAGES = 64
+    EXTRACT_WORKERS = 8
+    
     def __init__(self, chunk_size: int = 500, overlap: int = 100):
         """
         Initialize document processor
@@ -65,22 +277,58 @@ class DocumentProcessor:
         self.chunk_size = chunk_size
         self.overlap = overlap
     
-    def load_pdf(self, pdf_path: str) -> str:
-        """Extract text from PDF file"""
-        text = ""
+    def iter_pages(self, pdf_path: str) -> Iterator[Tuple[int, str]]:
+        """Lazily extract (page_num, text) pairs, one page at a time"""
+        if pymupdf is not None:
+            workers = min(self.EXTRACT_WORKERS, available_cpus())
+            with pymupdf.open(pdf_path) as pdf_document:
+                page_count = pdf_document.page_count
+                if page_count < self.PARALLEL_EXTRACT_MIN_PAGES or workers < 2:
+                    for page_num, page in enumerate(pdf_document):
+                        yield page_num + 1, page.get_text("text")
+                    return
+            yield from self._iter_pages_parallel(pdf_path, page_count, workers)
+            return
+        
         with open(pdf_path, 'rb') as file:
             pdf_reader = PyPDF2.PdfReader(file)
             for page_num, page in enumerate(pdf_reader.pages):
-                page_text = page.extract_text()
-                text += f"\n[Page {page_num + 1}]\n{page_text}"
-        return text
+                yield page_num + 1, page.extract_text()
+    
+    def _iter_pages_parallel(self, pdf_path: str, page_count: int, workers: int) -> Iterator[Tuple[int, str]]:
+        """
+        Extract pages in worker processes, each opening its own copy of the PDF
+        
+        Pages are split into a few contiguous ranges per worker (for load
+        balancing) and yielded in page order as ranges complete.
+        """
+        range_size = -(-page_count // (workers * 4))
+        starts = range(0, page_count, range_size)
+        stops = [min(start + range_size, page_count) for start in starts]
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            page_num = 1
+            for page_texts in executor.map(_extract_page_range, repeat(pdf_path), starts, stops):
+                for page_text in page_texts:
+                    yield page_num, page_text
+                    page_num += 1
+    
+    def load_pdf(self, pdf_path: str) -> str:
+        """Extract text from PDF file"""
+        return "".join(
+            f"\n[Page {page_num}]\n{page_text}"
+            for page_num, page_text in self.iter_pages(pdf_path)
+        )
     
     def clean_text(self, text: str) -> str:
         """Clean extracted text"""
         # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text)
-        # Remove special characters but keep punctuation
-        text = re.sub(r'[^\w\s.,!?;:()\-\[\]]', '', text)
+        text = _WHITESPACE_RE.sub(' ', text)
+        # Remove special characters but keep punctuation (plain deletion table for ASCII pages)
+        if text.isascii():
+            text = text.translate(_ASCII_SPECIAL_CHARS)
+        else:
+            text = _SPECIAL_CHARS_RE.sub('', text)
         return text.strip()
     
     def chunk_text(self, text: str, source: str = "policy.pdf") -> List[Document]:
@@ -89,151 +337,1100 @@ class DocumentProcessor:
         
         Uses sliding window approach to maintain context continuity
         """
-        chunks = []
-        chunk_id = 0
-        
         # Extract page numbers if available
         page_pattern = r'\[Page (\d+)\]'
         sections = re.split(page_pattern, text)
+        pages = (
+            (int(sections[i]), sections[i + 1] if i + 1 < len(sections) else "")
+            for i in range(1, len(sections), 2)
+        )
+        
+        return list(self.chunk_pages(pages, source))
+    
+    def chunk_pages(self, pages: Iterable[Tuple[int, str]], source: str = "policy.pdf") -> Iterator[Document]:
+        """
+        Stream overlapping chunks from (page_num, text) pairs
+        
+        Chunks are yielded as soon as the next one is known (a tiny trailing
+        chunk is merged into its predecessor), so pages can be parsed while
+        earlier chunks are already being embedded.
+        """
+        stride = self.chunk_size - self.overlap
+        pending = None
+        # Tiny chunks merged into `pending`, joined once when it is yielded
+        pending_tail = []
+        chunk_id = 0
         
-        current_page = 1
-        for i in range(1, len(sections), 2):
-            if i < len(sections):
-                current_page = int(sections[i])
-                page_text = sections[i + 1] if i + 1 < len(sections) else ""
-                
-                # Clean the page text
-                page_text = self.clean_text(page_text)
-                
-                # Create chunks from this page
-                start = 0
-                while start < len(page_text):
-                    end = start + self.chunk_size
-                    chunk_text = page_text[start:end]
-                    
-                    # Don't create tiny chunks at the end
-                    if len(chunk_text) < 50 and chunks:
-                        chunks[-1].text += " " + chunk_text
-                    else:
-                        chunks.append(Document(
-                            text=chunk_text,
-                            chunk_id=chunk_id,
-                            page_num=current_page,
-                            source=source
-                        ))
-                        chunk_id += 1
-                    
-                    start += self.chunk_size - self.overlap
-        
-        return chunks
+        for current_page, page_text in pages:
+            # Clean the page text
+            page_text = self.clean_text(page_text)
+            
+            # Window offsets for the whole page at once. Windows only shrink at the
+            # end of the page, so the tiny ones form a suffix of the list
+            starts = np.arange(0, len(page_text), stride)
+            lengths = np.minimum(starts + self.chunk_size, len(page_text)) - starts
+            n_full = int(np.count_nonzero(lengths >= self.MIN_CHUNK_SIZE))
+            windows = [page_text[start:start + self.chunk_size] for start in starts.tolist()]
+            
+            # Nothing to merge into yet: the first window becomes a chunk even if tiny
+            if n_full == 0 and pending is None and windows:
+                n_full = 1
+            
+            # Don't create tiny chunks at the end: merge them into the preceding chunk
+            if n_full == 0:
+                pending_tail.extend(windows)
+                continue
+            
+            if pending is not None:
+                yield self._with_tail(pending, pending_tail)
+            
+            page_chunks = [
+                Document(text=text, chunk_id=chunk_id + i, page_num=current_page, source=source)
+                for i, text in enumerate(windows[:n_full])
+            ]
+            chunk_id += n_full
+            yield from page_chunks[:-1]
+            pending = page_chunks[-1]
+            pending_tail = windows[n_full:]
+        
+        if pending is not None:
+            yield self._with_tail(pending, pending_tail)
+    
+    @staticmethod
+    def _with_tail(document: Document, tail: List[str]) -> Document:
+        """Append merged tiny chunks to a document's text in a single join"""
+        if tail:
+            document.text = " ".join([document.text, *tail])
+        return document
+
+
+class SemanticCache:
+    """
+    Answer cache keyed by query meaning rather than exact text
+    
+    Paraphrased questions ("refund policy" vs "policy on refunds") embed to
+    nearly the same vector, so a stored answer is returned when the cosine
+    similarity to a previous query is above the threshold. Entries are kept
+    separately per (prompt_version, top_k) so different settings never mix.
+    
+    With a cache_path and an index_key, entries are also written to a SQLite
+    file as they are added, and the in-memory FAISS indexes are rebuilt from
+    it on startup. Persisted entries are tagged with the index key they were
+    answered from, and only entries for the current key are loaded, so answers
+    about a changed document (or different chunking) are never served.
+    Without an index key nothing identifies the documents, so the cache stays
+    in memory only.
+    """
+    
+    def __init__(self, embedding_model, threshold: float = 0.95, cache_path: Optional[str] = None,
+                 index_key: Optional[str] = None):
+        """
+        Args:
+            embedding_model: Model whose query embeddings are stored (shared with RAGPipeline)
+            threshold: Minimum cosine similarity for a cache hit
+            cache_path: Optional SQLite file to persist the cache between runs
+            index_key: Identifies the document index answers come from (see load_or_build_index);
+                       required for cache_path to be used
+        """
+        self.embedding_model = embedding_model
+        self.threshold = threshold
+        self.cache_path = cache_path
+        self.index_key = index_key
+        # (prompt_version, top_k) -> (FAISS inner-product index, stored responses)
+        self._entries: Dict[Tuple[int, int], Tuple[object, List[Dict]]] = {}
+        self._db = None
+        
+        if cache_path and index_key is not None:
+            os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(cache_path)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "prompt_version INTEGER, top_k INTEGER, query TEXT, embedding BLOB, response TEXT, index_key TEXT)"
+            )
+            # Stores written before entries were tagged get the column; their rows are never loaded
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(answers)")]
+            if "index_key" not in columns:
+                with self._db:
+                    self._db.execute("ALTER TABLE answers ADD COLUMN index_key TEXT")
+            self._load()
+    
+    def lookup(self, query_vector: np.ndarray, prompt_version: int, top_k: int) -> Optional[Dict]:
+        """Return the cached response for the most similar query, if similar enough"""
+        entry = self._entries.get((prompt_version, top_k))
+        if entry is None:
+            return None
+        
+        index, responses = entry
+        similarities, indices = index.search(query_vector, 1)
+        if indices[0][0] >= 0 and similarities[0][0] >= self.threshold:
+            return responses[indices[0][0]]
+        return None
+    
+    def add(self, query_vector: np.ndarray, prompt_version: int, top_k: int, response: Dict):
+        """Store a response under its query embedding"""
+        self._add_in_memory(query_vector, prompt_version, top_k, response)
+        
+        if self._db is not None:
+            with self._db:
+                self._db.execute(
+                    "INSERT INTO answers (prompt_version, top_k, query, embedding, response, index_key) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (prompt_version, top_k, response["query"], query_vector.tobytes(), json.dumps(response),
+                     self.index_key)
+                )
+    
+    def _add_in_memory(self, query_vector: np.ndarray, prompt_version: int, top_k: int, response: Dict):
+        key = (prompt_version, top_k)
+        if key not in self._entries:
+            self._entries[key] = (faiss.IndexFlatIP(query_vector.shape[1]), [])
+        
+        index, responses = self._entries[key]
+        index.add(query_vector)
+        responses.append(response)
+    
+    def _load(self):
+        """Rebuild the in-memory indexes from the SQLite store entries for this index key"""
+        dimension = self.embedding_model.get_sentence_embedding_dimension()
+        rows = self._db.execute(
+            "SELECT prompt_version, top_k, embedding, response FROM answers WHERE index_key = ?",
+            (self.index_key,)
+        )
+        for prompt_version, top_k, embedding, response in rows:
+            query_vector = np.frombuffer(embedding, dtype=np.float32).reshape(1, -1)
+            # Skip entries written by a different embedding model
+            if query_vector.shape[1] == dimension:
+                self._add_in_memory(query_vector, prompt_version, top_k, json.loads(response))
+    
+    def __len__(self) -> int:
+        return sum(len(responses) for _, responses in self._entries.values())
+
+
+class OnnxEmbedder:
+    """
+    Sentence embedder running an int8-quantized ONNX export on ONNX Runtime
+    
+    Provides the parts of the SentenceTransformer API this module uses
+    (encode, get_sentence_embedding_dimension) with the same mean pooling as
+    all-MiniLM-L6-v2, so it can replace the PyTorch model for faster CPU
+    embedding. Prepare the model directory once, either with optimum
+    (graph optimization plus VNNI int8 quantization):
+    
+        OnnxEmbedder.export("sentence-transformers/all-MiniLM-L6-v2", "./minilm-onnx")
+    
+    or from a plain ONNX export:
+    
+        optimum-cli export onnx --model sentence-transformers/all-MiniLM-L6-v2 \\
+            --task feature-extraction ./minilm-onnx
+        OnnxEmbedder.quantize("./minilm-onnx")
+    """
+    
+    QUANTIZED_MODEL_FILE = "model.int8.onnx"
+    
+    def __init__(self, model_dir: str, max_length: int = 256):
+        """
+        Args:
+            model_dir: Directory with the tokenizer files and model.int8.onnx
+            max_length: Maximum tokens per text (all-MiniLM-L6-v2 uses 256)
+        """
+        if onnxruntime is None:
+            raise ImportError("ONNX backend requires: pip install onnxruntime transformers")
+        
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, self.QUANTIZED_MODEL_FILE),
+            providers=["CPUExecutionProvider"]
+        )
+        self.max_length = max_length
+        self._input_names = [model_input.name for model_input in self.session.get_inputs()]
+    
+    @classmethod
+    def quantize(cls, model_dir: str, model_file: str = "model.onnx"):
+        """Write a dynamically int8-quantized copy of an exported ONNX model"""
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        
+        quantize_dynamic(
+            os.path.join(model_dir, model_file),
+            os.path.join(model_dir, cls.QUANTIZED_MODEL_FILE),
+            weight_type=QuantType.QInt8
+        )
+    
+    @classmethod
+    def export(cls, model_name: str, model_dir: str, quantization_target: str = "avx512_vnni"):
+        """
+        Export a Hugging Face model to ONNX, apply all graph optimizations and
+        dynamically int8-quantize it for `quantization_target` (an
+        AutoQuantizationConfig preset: "avx512_vnni", "avx512", "avx2" or "arm64")
+        
+        Requires: pip install optimum[onnxruntime]
+        """
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTOptimizer, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig, OptimizationConfig
+        
+        model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+        model.save_pretrained(model_dir)
+        AutoTokenizer.from_pretrained(model_name).save_pretrained(model_dir)
+        
+        optimizer = ORTOptimizer.from_pretrained(model)
+        optimizer.optimize(save_dir=model_dir, optimization_config=OptimizationConfig(optimization_level=99))
+        
+        quantizer = ORTQuantizer.from_pretrained(model_dir, file_name="model_optimized.onnx")
+        quantization_config = getattr(AutoQuantizationConfig, quantization_target)(is_static=False, per_channel=False)
+        quantizer.quantize(save_dir=model_dir, quantization_config=quantization_config)
+        os.replace(
+            os.path.join(model_dir, "model_optimized_quantized.onnx"),
+            os.path.join(model_dir, cls.QUANTIZED_MODEL_FILE)
+        )
+    
+    @classmethod
+    def is_prepared(cls, model_dir: str) -> bool:
+        """Whether model_dir already holds a quantized model"""
+        return os.path.exists(os.path.join(model_dir, cls.QUANTIZED_MODEL_FILE))
+    
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.session.get_outputs()[0].shape[-1]
+    
+    def encode(self, texts: List[str], batch_size: int = 32, show_progress_bar: bool = False,
+               convert_to_numpy: bool = True, normalize_embeddings: bool = False) -> np.ndarray:
+        """
+        Embed texts: tokenize, run the ONNX model, mean-pool over real tokens
+        
+        Texts are batched in length order so each batch pads to similar
+        lengths (SBERT's smart batching); results come back in input order.
+        """
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        sorted_texts = [texts[i] for i in order]
+        
+        batches = []
+        for start in range(0, len(sorted_texts), batch_size):
+            tokens = self.tokenizer(
+                sorted_texts[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np"
+            )
+            inputs = {name: tokens[name].astype(np.int64) for name in self._input_names}
+            token_embeddings = self.session.run(None, inputs)[0]
+            
+            mask = tokens["attention_mask"][..., None].astype(np.float32)
+            batches.append((token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9))
+        
+        if not batches:
+            return np.empty((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+        
+        embeddings = np.empty((len(texts), batches[0].shape[1]), dtype=np.float32)
+        embeddings[order] = np.vstack(batches)
+        if normalize_embeddings:
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings
 
 
 class RAGPipeline:
     """Main RAG system with embedding, retrieval, and generation using Groq"""
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    # Chunks per forward pass when embedding documents
+    ENCODE_BATCH_SIZE = 256
+    
+    # Cosine similarity of the best chunk: below the minimum nothing is answered,
+    # above the high/medium thresholds retrieval confidence is reported as such
+    MIN_RELEVANT_SIMILARITY = 0.25
+    HIGH_CONFIDENCE_SIMILARITY = 0.7
+    MEDIUM_CONFIDENCE_SIMILARITY = 0.5
+    
+    # Stop sequence for streamed V2 answers that only need the answer and citations
+    V2_STOP_BEFORE_NOTE = ["**Note:**"]
+    
+    # Groq chat model used for answers
+    LLM_MODEL = "llama-3.1-8b-instant"
+    
+    # Batch answering: at most this many Groq calls in flight; transient failures
+    # are retried after the server's Retry-After (capped at LLM_MAX_RETRY_DELAY
+    # seconds) or with exponential backoff starting at LLM_RETRY_BASE_DELAY seconds
+    LLM_CONCURRENCY = 8
+    LLM_MAX_RETRIES = 4
+    LLM_RETRY_BASE_DELAY = 1.0
+    LLM_MAX_RETRY_DELAY = 60.0
+    RETRYABLE_STATUS_CODES = (408, 409, 429)
+    
+    # Most recent (query, top_k) retrievals and query embeddings kept in memory
+    RETRIEVAL_CACHE_SIZE = 512
+    QUERY_EMBEDDING_CACHE_SIZE = 4096
+    # Formatted prompt excerpts, keyed by (prompt version, excerpt number, chunk)
+    EXCERPT_CACHE_SIZE = 2048
+    
+    # Below this many chunks exact brute-force search beats graph traversal
+    FLAT_INDEX_MAX_SIZE = 5000
+    
+    # Below this many chunks GPU transfer and launch overhead outweighs faster search,
+    # so GPU-capable pipelines keep using the CPU indexes
+    GPU_INDEX_MIN_SIZE = 100000
+    
+    # HNSW graph parameters: M links per node, build/search beam widths
+    HNSW_M = 32
+    HNSW_EF_CONSTRUCTION = 128
+    HNSW_EF_SEARCH = 64
+    
+    # Binary quantization: Hamming search over this many x top_k candidates, then float rescoring
+    BINARY_RESCORE_FACTOR = 4
+    
+    # Above this many chunks, full-precision mode uses IVF-PQ: vectors are compressed to
+    # IVFPQ_M one-byte codes in ~4*sqrt(n) inverted lists, IVF_NPROBE lists are scanned,
+    # and PQ_RESCORE_FACTOR x top_k candidates are rescored with exact cosine similarity
+    IVFPQ_MIN_SIZE = 50000
+    IVFPQ_M = 48
+    IVF_NPROBE = 16
+    PQ_RESCORE_FACTOR = 4
+    
+    # Scalar quantizers for the "fp16" / "int8" modes (decoded inside FAISS's SIMD distance kernels)
+    SCALAR_QUANTIZERS = {
+        "fp16": "QT_fp16",
+        "int8": "QT_8bit",
+    }
+    
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", quantization: Optional[str] = None,
+                 device: Optional[str] = None, onnx_model_dir: Optional[str] = None,
+                 num_threads: Optional[int] = None):
         """
         Initialize RAG pipeline
         
         Args:
             model_name: SentenceTransformer model for embeddings
                        (all-MiniLM-L6-v2: fast, good quality, 384 dims)
+            quantization: None for full-precision vectors in the index,
+                       "fp16" / "int8" to store vectors at 2 / 1 bytes per dimension, or
+                       "binary" to index 1 bit per dimension (32x smaller) and
+                       rescore the Hamming candidates with float cosine similarity
+            device: "cuda" or "cpu" for the embedding model (default: cuda if available)
+            onnx_model_dir: Optional directory with an int8 ONNX export of model_name;
+                       embeds with ONNX Runtime on CPU instead of PyTorch (see OnnxEmbedder).
+                       Created with optimum on first use if missing; without optimum
+                       the PyTorch model is used instead
+            num_threads: CPU threads for embedding and search. The pools are shared by
+                       the whole process, so this applies to every pipeline in it; by
+                       default the first pipeline sizes them to available_cpus() and
+                       later ones leave them alone. With N worker processes on one
+                       machine, pass available_cpus() // N to avoid oversubscription
         """
-        self.embedding_model = SentenceTransformer(model_name)
-        self.documents: List[Document] = []
+        if quantization not in (None, "binary", *self.SCALAR_QUANTIZERS):
+            raise ValueError(f"Unknown quantization: {quantization}")
+        
+        if device is None:
+            device = "cuda" if torch is not None and torch.cuda.is_available() else "cpu"
+        
+        if num_threads is not None:
+            _set_num_threads(num_threads)
+        elif _NUM_THREADS is None:
+            _set_num_threads(available_cpus())
+        
+        if onnx_model_dir and not OnnxEmbedder.is_prepared(onnx_model_dir):
+            hub_name = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+            try:
+                OnnxEmbedder.export(hub_name, onnx_model_dir)
+            except ImportError:
+                print("⚠️ optimum not installed, using the PyTorch embedding model. "
+                      "Install with: pip install optimum[onnxruntime]")
+                onnx_model_dir = None
+        
+        # Loaded once per process and shared by every pipeline using the same model
+        model_key = ("onnx", onnx_model_dir) if onnx_model_dir else (model_name, device)
+        if model_key not in _MODEL_CACHE:
+            if onnx_model_dir:
+                _MODEL_CACHE[model_key] = OnnxEmbedder(onnx_model_dir)
+            else:
+                _MODEL_CACHE[model_key] = SentenceTransformer(model_name, device=device)
+        self.embedding_model = _MODEL_CACHE[model_key]
+        self.model_name = model_name
+        self.onnx_model_dir = onnx_model_dir
+        self.quantization = quantization
+        self.device = device
+        
+        # Large full-precision indexes run as exact GEMM on the GPU when a faiss-gpu
+        # build can see a CUDA device (FAISS has no GPU HNSW; quantized modes stay on CPU)
+        self.gpu_resources = None
+        if (device.startswith("cuda") and quantization is None
+                and hasattr(faiss, "StandardGpuResources") and faiss.get_num_gpus() > 0):
+            self.gpu_resources = faiss.StandardGpuResources()
+        
+        # Chunk fields stored as parallel arrays (struct-of-arrays), indexed by FAISS id.
+        # Texts live in one UTF-8 blob; chunk i is _text_blob[_text_offsets[i]:_text_offsets[i + 1]]
+        self._text_blob = b""
+        self._text_offsets = np.zeros(1, dtype=np.int64)
+        self._pages = np.empty(0, dtype=np.int32)
+        self._chunk_ids = np.empty(0, dtype=np.int32)
+        # Sources repeat across chunks, so each chunk stores an index into _source_names
+        self._source_names: List[str] = []
+        self._source_ids = np.empty(0, dtype=np.int32)
+        # Sorted (source_id, chunk_id) keys and their index positions, built on first lookup
+        self._sorted_chunk_keys: Optional[np.ndarray] = None
+        self._chunk_positions: Optional[np.ndarray] = None
+        self._retrieval_cache = _LRUCache(self.RETRIEVAL_CACHE_SIZE)
+        self._excerpt_cache = _LRUCache(self.EXCERPT_CACHE_SIZE)
+        self._query_embedding_cache = _LRUCache(self.QUERY_EMBEDDING_CACHE_SIZE)
+        self.answer_cache = None
+        # float16 copy for exact rescoring; None unless the index is binary or IVF-PQ
+        self.embeddings: Optional[np.ndarray] = None
         self.index = None
         self.groq_client = None
+        self.async_groq_client = None
+        self.semantic_cache: Optional[SemanticCache] = None
+        self._index_key: Optional[str] = None
         
-        # Initialize Groq client
+        # Initialize Groq clients (sync for single calls, async for concurrent batches).
+        # The sync client is shared per API key; the async one stays per pipeline
+        # because its pooled connections belong to the event loop that first uses them
         groq_api_key = os.getenv("GROQ_API_KEY")
         if groq_api_key:
-            self.groq_client = Groq(api_key=groq_api_key)
+            if groq_api_key not in _GROQ_CLIENTS:
+                _GROQ_CLIENTS[groq_api_key] = Groq(api_key=groq_api_key, http_client=self._make_http_client(httpx.Client))
+            self.groq_client = _GROQ_CLIENTS[groq_api_key]
+            # _acomplete retries transient failures itself, so the SDK's own retries are off
+            self.async_groq_client = AsyncGroq(api_key=groq_api_key, max_retries=0,
+                                               http_client=self._make_http_client(httpx.AsyncClient))
             print("✓ Groq API client initialized successfully")
         else:
             print("⚠️ GROQ_API_KEY not set. Please set it to use the LLM.")
     
-    def add_documents(self, documents: List[Document]):
-        """Add documents to the knowledge base"""
-        self.documents = documents
+    @staticmethod
+    def _make_http_client(client_class):
+        """
+        Pooled HTTP client (httpx.Client or httpx.AsyncClient) for Groq calls
+        
+        Keep-alive connections amortize TCP/TLS handshakes across calls;
+        HTTP/2 multiplexes the requests over one connection when `h2` is installed.
+        """
+        limits = httpx.Limits(max_connections=32, max_keepalive_connections=16)
+        timeout = httpx.Timeout(60.0, connect=5.0)
+        try:
+            return client_class(http2=True, limits=limits, timeout=timeout)
+        except ImportError:
+            return client_class(limits=limits, timeout=timeout)
+    
+    def enable_semantic_cache(self, threshold: float = 0.95, cache_path: Optional[str] = None):
+        """
+        Serve paraphrased repeat questions from a semantic cache
+        
+        Reuses this pipeline's embedding model, so no extra model is loaded.
+        Answers are only persisted to cache_path while an index key is set
+        (see index_key); until then they are kept in memory.
+        """
+        self.semantic_cache = SemanticCache(self.embedding_model, threshold, cache_path, self.index_key)
+        print(f"✓ Semantic cache enabled ({len(self.semantic_cache)} cached answers)")
+    
+    def enable_answer_cache(self, cache_dir: str = ".rag_cache/answers"):
+        """
+        Reuse LLM answers for exactly repeated prompts across runs
         
-        # Generate embeddings
-        texts = [doc.text for doc in documents]
-        embeddings = self.embedding_model.encode(texts, show_progress_bar=True)
+        Answers are keyed on a hash of the model, token limit and full chat
+        messages (prompt template, excerpts and question), so any change to
+        what would be sent to Groq is a miss. Requires `diskcache`.
+        """
+        if diskcache is None:
+            print("⚠️ diskcache not installed, answer cache disabled. Install with: pip install diskcache")
+            return
+        self.answer_cache = diskcache.Cache(cache_dir)
+        print(f"✓ Answer cache enabled ({len(self.answer_cache)} cached answers)")
+    
+    @property
+    def index_key(self) -> Optional[str]:
+        """
+        Identifies the loaded documents and index settings (set by load_or_build_index)
+        
+        Persisted semantic cache entries are tagged with it. Replacing the
+        documents clears it, and every change reopens the semantic cache under
+        the new key, so answers about other documents are never served.
+        """
+        return self._index_key
+    
+    @index_key.setter
+    def index_key(self, index_key: Optional[str]):
+        self._index_key = index_key
+        if self.semantic_cache is not None:
+            cache = self.semantic_cache
+            self.semantic_cache = SemanticCache(cache.embedding_model, cache.threshold, cache.cache_path, index_key)
+    
+    @property
+    def documents(self) -> List[Document]:
+        """All chunks in the knowledge base, materialized as Document objects"""
+        return self._get_documents(np.arange(self._num_documents()))
+    
+    def _num_documents(self) -> int:
+        return len(self._pages)
+    
+    def _set_documents(self, documents: List[Document]):
+        """Store chunk fields column-wise so embedding and lookups touch only what they need"""
+        encoded_texts = [doc.text.encode("utf-8") for doc in documents]
+        text_offsets = np.zeros(len(encoded_texts) + 1, dtype=np.int64)
+        np.cumsum([len(text) for text in encoded_texts], out=text_offsets[1:])
+        
+        source_names = list(dict.fromkeys(doc.source for doc in documents))
+        source_ids = {source: i for i, source in enumerate(source_names)}
+        
+        self._set_columns(
+            text_blob=b"".join(encoded_texts),
+            text_offsets=text_offsets,
+            pages=np.array([doc.page_num for doc in documents], dtype=np.int32),
+            chunk_ids=np.array([doc.chunk_id for doc in documents], dtype=np.int32),
+            source_names=source_names,
+            source_ids=np.array([source_ids[doc.source] for doc in documents], dtype=np.int32)
+        )
+    
+    def _set_columns(self, text_blob: bytes, text_offsets: np.ndarray, pages: np.ndarray,
+                     chunk_ids: np.ndarray, source_names: List[str], source_ids: np.ndarray):
+        """Install chunk columns and drop everything derived from the previous chunks"""
+        self._text_blob = text_blob
+        self._text_offsets = text_offsets
+        self._pages = pages
+        self._chunk_ids = chunk_ids
+        self._source_names = source_names
+        self._source_ids = source_ids
+        self._sorted_chunk_keys = None
+        self._chunk_positions = None
+        self._retrieval_cache.clear()
+        self._excerpt_cache.clear()
+        self.index_key = None
+    
+    def _get_text(self, idx: int) -> str:
+        """Decode one chunk's text from the blob"""
+        return self._text_blob[self._text_offsets[idx]:self._text_offsets[idx + 1]].decode("utf-8")
+    
+    def get_chunk_text(self, source: str, chunk_id: int) -> str:
+        """Text of a chunk referenced by a response's context entry (entry["source"], entry["chunk_id"])"""
+        return self._get_text(self._chunk_position(source, chunk_id))
+    
+    def _chunk_position(self, source: str, chunk_id: int) -> int:
+        """
+        Index position of a chunk, by binary search over its (source, chunk_id)
+        
+        chunk_id restarts at 0 for each source file, so both identify a chunk.
+        The pair is packed into one int64 per chunk; the sorted keys are built on
+        the first lookup, so add_documents and load() don't pay for them.
+        """
+        if self._sorted_chunk_keys is None:
+            keys = (self._source_ids.astype(np.int64) << 32) | self._chunk_ids.astype(np.int64)
+            self._chunk_positions = np.argsort(keys, kind="stable")
+            self._sorted_chunk_keys = keys[self._chunk_positions]
+        
+        if source not in self._source_names:
+            raise KeyError((source, chunk_id))
+        key = (self._source_names.index(source) << 32) | chunk_id
+        slot = int(np.searchsorted(self._sorted_chunk_keys, key))
+        if slot == len(self._sorted_chunk_keys) or self._sorted_chunk_keys[slot] != key:
+            raise KeyError((source, chunk_id))
+        return int(self._chunk_positions[slot])
+    
+    def _get_documents(self, indices: np.ndarray) -> List[Document]:
+        """Build the Documents for an array of index positions, gathering each column once"""
+        starts = self._text_offsets[indices].tolist()
+        ends = self._text_offsets[indices + 1].tolist()
+        chunk_ids = self._chunk_ids[indices].tolist()
+        pages = self._pages[indices].tolist()
+        source_ids = self._source_ids[indices].tolist()
+        
+        text_blob = self._text_blob
+        return [
+            Document(
+                text=text_blob[start:end].decode("utf-8"),
+                chunk_id=chunk_id,
+                page_num=page_num,
+                source=self._source_names[source_id]
+            )
+            for start, end, chunk_id, page_num, source_id in zip(starts, ends, chunk_ids, pages, source_ids)
+        ]
+    
+    def add_documents(self, documents: Iterable[Document]):
+        """
+        Add documents to the knowledge base
+        
+        Accepts a list or any iterable of chunks (e.g. DocumentProcessor.chunk_pages);
+        chunks are embedded in batches as they arrive, so parsing and embedding overlap.
+        """
+        all_documents = []
+        embedding_batches = []
+        for batch in _batched(documents, self.ENCODE_BATCH_SIZE):
+            all_documents.extend(batch)
+            embedding_batches.append(self._encode_documents([doc.text for doc in batch]))
+        
+        self._set_documents(all_documents)
+        embeddings = np.vstack(embedding_batches)
+        
+        self.index = self._build_index(embeddings)
+        # Kept only where search rescores shortlists exactly; float16 halves memory and is upcast when used
+        self.embeddings = embeddings.astype(np.float16) if self._needs_rescoring() else None
+        
+        print(f"✓ Added {len(all_documents)} documents to the index")
+    
+    def save(self, path: str):
+        """
+        Persist chunks, index and (for rescoring indexes) embeddings to a directory
         
-        # Create FAISS index
+        Chunk columns are written as NumPy arrays next to the raw UTF-8 text blob
+        and the index in FAISS's own format, so load() needs neither re-embedding
+        nor unpickling.
+        """
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, "texts.bin"), 'wb') as f:
+            f.write(self._text_blob)
+        np.savez(
+            os.path.join(path, "chunks.npz"),
+            text_offsets=self._text_offsets,
+            pages=self._pages,
+            chunk_ids=self._chunk_ids,
+            source_names=np.array(self._source_names, dtype=str),
+            source_ids=self._source_ids
+        )
+        if self.embeddings is not None:
+            np.save(os.path.join(path, "embeddings.npy"), self.embeddings)
+        if self.quantization == "binary":
+            index = self.index
+            faiss.write_index_binary(index, os.path.join(path, "index.bin"))
+        else:
+            index = self._index_to_cpu(self.index)
+            faiss.write_index(index, os.path.join(path, "index.bin"))
+        
+        # Written last: its presence marks a complete save. The index type tells
+        # load() which FAISS mmap flag applies
+        with open(os.path.join(path, "pipeline.json"), 'w') as f:
+            json.dump({**self._saved_settings(), "index_type": type(index).__name__}, f)
+    
+    def load(self, path: str):
+        """
+        Load chunks, index and embeddings written by save()
+        
+        Embeddings (saved only for rescoring indexes) are memory-mapped, and so is the bulk of the index where
+        FAISS supports it: the inverted lists of an IVF-PQ index, and the vector
+        storage of flat and HNSW indexes on FAISS releases with IO_FLAG_MMAP_IFC.
+        Older releases read flat and HNSW indexes fully into memory.
+        
+        Raises:
+            ValueError: If the directory was saved with a different embedding model
+                       or quantization mode
+        """
+        with open(os.path.join(path, "pipeline.json")) as f:
+            settings = json.load(f)
+        index_type = settings.pop("index_type", None)
+        if settings != self._saved_settings():
+            raise ValueError(f"{path} was saved with different settings: {settings}")
+        
+        with open(os.path.join(path, "texts.bin"), 'rb') as f:
+            text_blob = f.read()
+        with np.load(os.path.join(path, "chunks.npz")) as chunks:
+            self._set_columns(
+                text_blob=text_blob,
+                text_offsets=chunks["text_offsets"],
+                pages=chunks["pages"],
+                chunk_ids=chunks["chunk_ids"],
+                source_names=chunks["source_names"].tolist(),
+                source_ids=chunks["source_ids"]
+            )
+        
+        index_path = os.path.join(path, "index.bin")
+        # IO_FLAG_MMAP only maps IVF inverted lists; IO_FLAG_MMAP_IFC maps other
+        # indexes' vector storage but not IVF lists, and the two can't be combined
+        io_flags = faiss.IO_FLAG_MMAP
+        if hasattr(faiss, "IO_FLAG_MMAP_IFC") and index_type and not index_type.startswith("IndexIVF"):
+            io_flags = faiss.IO_FLAG_MMAP_IFC
+        if self.quantization == "binary":
+            self.index = faiss.read_index_binary(index_path, io_flags)
+        else:
+            self.index = self._index_to_device(faiss.read_index(index_path, io_flags))
+        self.embeddings = None
+        if self._needs_rescoring():
+            self.embeddings = np.load(os.path.join(path, "embeddings.npy"), mmap_mode='r')
+    
+    @staticmethod
+    def is_saved(path: str) -> bool:
+        """Whether path holds a complete save()"""
+        return os.path.exists(os.path.join(path, "pipeline.json"))
+    
+    def _saved_settings(self) -> Dict:
+        """Settings a saved index depends on, checked again by load()"""
+        return {
+            "model_name": self.model_name,
+            "onnx_model_dir": self.onnx_model_dir,
+            "quantization": self.quantization
+        }
+    
+    def _encode_documents(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed chunk texts in one batched call, normalized so inner product equals
+        cosine similarity (SBERT already length-sorts inside encode to minimize padding)
+        """
+        return self.embedding_model.encode(
+            texts,
+            batch_size=self.ENCODE_BATCH_SIZE,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        ).astype('float32')
+    
+    def _build_index(self, embeddings: np.ndarray):
+        """
+        Create the FAISS index for the embeddings
+        
+        Small full-precision corpora use exact inner-product search, medium ones
+        HNSW for sub-linear approximate search, and very large ones IVF-PQ, which
+        keeps the index ~32x smaller than float32 vectors.
+        """
         dimension = embeddings.shape[1]
-        self.index = faiss.IndexFlatL2(dimension)
-        self.index.add(embeddings.astype('float32'))
         
-        print(f"✓ Added {len(documents)} documents to the index")
+        if self.gpu_resources is not None and len(embeddings) >= self.GPU_INDEX_MIN_SIZE:
+            index = faiss.IndexFlatIP(dimension)
+            index.add(embeddings)
+            return self._index_to_device(index)
+        
+        if self.quantization == "binary":
+            # 1 bit per dimension: sign of each component, compared by Hamming distance
+            index = faiss.IndexBinaryHNSW(dimension, self.HNSW_M)
+            index.hnsw.efConstruction = self.HNSW_EF_CONSTRUCTION
+            index.add(np.packbits(embeddings > 0, axis=1))
+        elif self.quantization in self.SCALAR_QUANTIZERS:
+            qtype = getattr(faiss.ScalarQuantizer, self.SCALAR_QUANTIZERS[self.quantization])
+            index = faiss.IndexHNSWSQ(dimension, qtype, self.HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = self.HNSW_EF_CONSTRUCTION
+            index.train(embeddings)
+            index.add(embeddings)
+        elif len(embeddings) < self.FLAT_INDEX_MAX_SIZE:
+            index = faiss.IndexFlatIP(dimension)
+            index.add(embeddings)
+        elif len(embeddings) < self.IVFPQ_MIN_SIZE:
+            index = faiss.IndexHNSWFlat(dimension, self.HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = self.HNSW_EF_CONSTRUCTION
+            index.add(embeddings)
+        else:
+            # The number of PQ sub-vectors must divide the dimension
+            n_lists = int(4 * np.sqrt(len(embeddings)))
+            n_subvectors = math.gcd(dimension, self.IVFPQ_M)
+            quantizer = faiss.IndexFlatIP(dimension)
+            index = faiss.IndexIVFPQ(quantizer, dimension, n_lists, n_subvectors, 8, faiss.METRIC_INNER_PRODUCT)
+            index.train(embeddings)
+            index.add(embeddings)
+            index.nprobe = self.IVF_NPROBE
+        
+        return index
     
     def retrieve(self, query: str, top_k: int = 3) -> List[Tuple[Document, float]]:
         """
         Retrieve most relevant documents for a query
         
+        Results are memoized per (query, top_k), so asking the same question
+        with another prompt version only repeats the LLM call.
+        
         Args:
             query: User question
             top_k: Number of documents to retrieve
         
         Returns:
-            List of (Document, similarity_score) tuples
+            List of (Document, cosine_similarity) tuples, most similar first
+        """
+        return self.retrieve_batch([query], top_k)[0]
+    
+    def retrieve_batch(self, queries: List[str], top_k: int = 3) -> List[List[Tuple[Document, float]]]:
+        """
+        Retrieve most relevant documents for several queries at once
+        
+        Queries missing from the retrieval cache are embedded in one encode call
+        and searched with one (N, d) index search, which FAISS parallelizes
+        across queries. Results seed the cache, so later retrieve() calls for
+        the same questions are free.
+        
+        Returns:
+            One list of (Document, cosine_similarity) tuples per query, in order
         """
-        # Embed query
-        query_embedding = self.embedding_model.encode([query])
+        # Results are collected locally; the LRU is only side storage, since a batch
+        # larger than the cache would evict its own early entries
+        results = {}
+        misses = []
+        for query in dict.fromkeys(queries):
+            cached = self._retrieval_cache.get((query, top_k))
+            if cached is None:
+                misses.append(query)
+            else:
+                results[query] = cached
+        
+        if misses:
+            similarities, indices = self._search(self._embed_queries(misses), top_k)
+            
+            # Gather every hit of every query in one pass (indexes pad missing results with -1),
+            # then split the flat list back into per-query rows
+            found = indices >= 0
+            hits = list(zip(self._get_documents(indices[found]), similarities[found].tolist()))
+            row_ends = np.cumsum(found.sum(axis=1)).tolist()
+            for query, row_start, row_end in zip(misses, [0] + row_ends, row_ends):
+                results[query] = hits[row_start:row_end]
+                self._retrieval_cache.put((query, top_k), results[query])
         
-        # Search
-        distances, indices = self.index.search(query_embedding.astype('float32'), top_k)
+        return [list(results[query]) for query in queries]
+    
+    def _embed_query(self, query: str) -> np.ndarray:
+        """Embed one query as a (1, d) array; see _embed_queries"""
+        return self._embed_queries([query])
+    
+    def _embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Embed queries (normalized inside encode, like the chunk embeddings)
         
-        # Return documents with scores
-        results = []
-        for idx, distance in zip(indices[0], distances[0]):
-            if idx < len(self.documents):
-                results.append((self.documents[idx], float(distance)))
+        Memoized per query, so the semantic cache lookup and retrieval share one
+        forward pass and repeated questions skip the embedding model entirely.
+        Uncached queries are embedded together in a single batched call.
+        """
+        embeddings = {}
+        misses = []
+        for query in dict.fromkeys(queries):
+            cached = self._query_embedding_cache.get(query)
+            if cached is None:
+                misses.append(query)
+            else:
+                embeddings[query] = cached
         
-        return results
+        if misses:
+            encoded = self.embedding_model.encode(
+                misses,
+                batch_size=64,
+                show_progress_bar=False,
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            ).astype('float32')
+            for query, embedding in zip(misses, encoded):
+                embeddings[query] = embedding
+                self._query_embedding_cache.put(query, embedding)
+        return np.vstack([embeddings[query] for query in queries])
     
-    def generate_answer_v1(self, query: str, context_docs: List[Document]) -> str:
+    def _index_to_device(self, index):
+        """Move a CPU index onto the GPU when GPU search is enabled and the index is large enough"""
+        if self.gpu_resources is None or index.ntotal < self.GPU_INDEX_MIN_SIZE:
+            return index
+        return faiss.index_cpu_to_gpu(self.gpu_resources, 0, index)
+    
+    def _index_to_cpu(self, index):
+        """CPU copy of the index, for serialization"""
+        if self.gpu_resources is None or index.ntotal < self.GPU_INDEX_MIN_SIZE:
+            return index
+        return faiss.index_gpu_to_cpu(index)
+    
+    def _search(self, query_embeddings: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Version 1: Initial prompt (basic, direct)
+        Search the index for a (N, d) batch of normalized queries
         
-        Prompt Design Principles:
-        - Clear role definition
-        - Explicit instruction to use only provided context
-        - Fallback for missing information
+        Returns (similarities, indices), both (N, top_k); missing results have index -1.
         """
-        if not self.groq_client:
-            return "Error: GROQ_API_KEY not set. Cannot generate answer."
+        if self.quantization == "binary":
+            # Coarse Hamming pass over packed bits, then exact cosine on the candidates
+            n_candidates = min(top_k * self.BINARY_RESCORE_FACTOR, self._num_documents())
+            self.index.hnsw.efSearch = max(self.HNSW_EF_SEARCH, n_candidates)
+            _, candidates = self.index.search(np.packbits(query_embeddings > 0, axis=1), n_candidates)
+            return self._rescore(query_embeddings, candidates, top_k)
+        
+        if isinstance(self.index, faiss.IndexIVFPQ):
+            # PQ distances are approximate: use them to shortlist, then rescore exactly
+            self.index.nprobe = self.IVF_NPROBE
+            _, candidates = self.index.search(query_embeddings, top_k * self.PQ_RESCORE_FACTOR)
+            return self._rescore(query_embeddings, candidates, top_k)
         
+        # efSearch must be at least top_k to return top_k results
+        if isinstance(self.index, faiss.IndexHNSW):
+            self.index.hnsw.efSearch = max(self.HNSW_EF_SEARCH, top_k)
+        return self.index.search(query_embeddings, top_k)
+    
+    def _needs_rescoring(self) -> bool:
+        """Whether _search shortlists approximately and rescores with self.embeddings"""
+        return self.quantization == "binary" or isinstance(self.index, faiss.IndexIVFPQ)
+    
+    def _rescore(self, query_embeddings: np.ndarray, candidates: np.ndarray,
+                 top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Exact cosine similarity over each query's candidate ids (-1 = none), keeping the top_k"""
+        similarities = np.full((len(query_embeddings), top_k), -np.inf, dtype=np.float32)
+        indices = np.full((len(query_embeddings), top_k), -1, dtype=np.int64)
+        for row, (row_candidates, query_embedding) in enumerate(zip(candidates, query_embeddings)):
+            row_candidates = row_candidates[row_candidates >= 0]
+            row_similarities = self.embeddings[row_candidates].astype(np.float32) @ query_embedding
+            best = _top_k_indices(row_similarities, top_k)
+            similarities[row, :len(best)] = row_similarities[best]
+            indices[row, :len(best)] = row_candidates[best]
+        return similarities, indices
+    
+    def _excerpt(self, prompt_version: int, excerpt_id: int, doc: Document) -> str:
+        """
+        One chunk formatted as a numbered prompt excerpt, memoized
+        
+        Popular chunks are retrieved again and again, usually at the same rank,
+        so the formatted string is reused instead of rebuilt for every prompt.
+        """
+        key = (prompt_version, excerpt_id, doc.source, doc.chunk_id)
+        excerpt = self._excerpt_cache.get(key)
+        if excerpt is None:
+            excerpt = EXCERPT_TEMPLATES[prompt_version].format_map(
+                {"id": excerpt_id, "page": doc.page_num, "text": doc.text}
+            )
+            self._excerpt_cache.put(key, excerpt)
+        return excerpt
+    
+    def _build_messages_v1(self, query: str, context_docs: List[Document]) -> List[Dict]:
+        """Build the V1 (basic) chat messages for a query and its context"""
         # Prepare context
-        context = "\n\n".join([
-            f"[Excerpt {i+1} from Page {doc.page_num}]:\n{doc.text}"
-            for i, doc in enumerate(context_docs)
-        ])
+        context = "\n\n".join([self._excerpt(1, i + 1, doc) for i, doc in enumerate(context_docs)])
         
-        prompt = f"""You are a helpful assistant answering questions about company policies.
-
-Context from policy documents:
-{context}
-
-Question: {query}
-
-Instructions:
-- Answer the question using ONLY the information provided in the context above
-- If the context doesn't contain the answer, say "I don't have enough information to answer this question"
-- Be concise and accurate
-
-Answer:"""
+        prompt = PROMPT_V1.format_map({"context": context, "query": query})
+        return [{"role": "user", "content": prompt}]
+    
+    def _build_messages_v2(self, query: str, context_docs: List[Document]) -> List[Dict]:
+        """Build the V2 (structured) chat messages: shared system prompt + excerpts and question"""
+        # Prepare context with clear labeling
+        context = "\n\n".join([self._excerpt(2, i + 1, doc) for i, doc in enumerate(context_docs)])
+        
+        prompt = PROMPT_V2.format_map({"context": context, "query": query})
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT_V2},
+            {"role": "user", "content": prompt}
+        ]
+    
+    def _answer_cache_key(self, messages: List[Dict], max_tokens: int, stop: Optional[List[str]] = None) -> str:
+        """Hash of everything that determines an LLM answer"""
+        key_fields = [self.LLM_MODEL, max_tokens, messages]
+        if stop:
+            key_fields.append(stop)
+        payload = json.dumps(key_fields, sort_keys=True)
+        return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+    
+    def _cached_answer(self, messages: List[Dict], max_tokens: int,
+                       stop: Optional[List[str]] = None) -> Tuple[Optional[str], Optional[str]]:
+        """Look up a stored answer, returning (answer, cache key)"""
+        if self.answer_cache is None:
+            return None, None
+        key = self._answer_cache_key(messages, max_tokens, stop)
+        return self.answer_cache.get(key), key
+    
+    def _store_answer(self, key: Optional[str], answer: str):
+        if key is not None:
+            self.answer_cache.set(key, answer)
+    
+    def _complete(self, messages: List[Dict], max_tokens: int) -> str:
+        """Send chat messages to Groq and return the completion text"""
+        if not self.groq_client:
+            return "Error: GROQ_API_KEY not set. Cannot generate answer."
+        
+        answer, cache_key = self._cached_answer(messages, max_tokens)
+        if answer is not None:
+            return answer
         
         try:
             completion = self.groq_client.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=[{"role": "user", "content": prompt}],
+                model=self.LLM_MODEL,
+                messages=messages,
                 temperature=0.2,
-                max_tokens=1000
+                max_tokens=max_tokens
             )
-            return completion.choices[0].message.content
+            answer = completion.choices[0].message.content
         except Exception as e:
             return f"Error generating answer: {str(e)}"
+        
+        self._store_answer(cache_key, answer)
+        return answer
+    
+    async def _acomplete(self, messages: List[Dict], max_tokens: int) -> str:
+        """Async variant of _complete, so several LLM calls can overlap"""
+        if not self.async_groq_client:
+            return "Error: GROQ_API_KEY not set. Cannot generate answer."
+        
+        answer, cache_key = self._cached_answer(messages, max_tokens)
+        if answer is not None:
+            return answer
+        
+        for attempt in range(self.LLM_MAX_RETRIES + 1):
+            try:
+                completion = await self.async_groq_client.chat.completions.create(
+                    model=self.LLM_MODEL,
+                    messages=messages,
+                    temperature=0.2,
+                    max_tokens=max_tokens
+                )
+                answer = completion.choices[0].message.content
+                break
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is not None and attempt < self.LLM_MAX_RETRIES:
+                    await asyncio.sleep(delay)
+                    continue
+                return f"Error generating answer: {str(e)}"
+        
+        self._store_answer(cache_key, answer)
+        return answer
+    
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """
+        Seconds to wait before retrying a failed Groq call, or None if it is not transient
+        
+        Follows the Groq SDK's own retry policy (turned off on the async client):
+        connection errors and timeouts, 408, 409, 429 and 5xx responses are retried.
+        A numeric Retry-After header is honoured; otherwise the delay doubles per attempt.
+        """
+        status_code = getattr(error, "status_code", None)
+        if status_code is None:
+            if not isinstance(error, APIConnectionError):
+                return None
+        elif status_code not in self.RETRYABLE_STATUS_CODES and status_code < 500:
+            return None
+        
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        try:
+            return min(max(float(retry_after), 0.0), self.LLM_MAX_RETRY_DELAY)
+        except (TypeError, ValueError):
+            return self.LLM_RETRY_BASE_DELAY * 2 ** attempt
+    
+    def _complete_stream(self, messages: List[Dict], max_tokens: int,
+                         stop: Optional[List[str]] = None) -> Generator[str, None, bool]:
+        """
+        Streaming variant of _complete, yielding text as Groq produces it
+        
+        `stop` sequences end generation server-side (the sequence itself is not
+        returned), so tokens after them are neither generated nor billed.
+        
+        The generator returns True once the whole answer has been streamed and
+        False if an error message was yielded instead (possibly after some
+        answer text), so callers can tell a complete answer from a broken one.
+        """
+        if not self.groq_client:
+            yield "Error: GROQ_API_KEY not set. Cannot generate answer."
+            return False
+        
+        answer, cache_key = self._cached_answer(messages, max_tokens, stop)
+        if answer is not None:
+            yield answer
+            return True
+        
+        stop_kwargs = {"stop": stop} if stop else {}
+        parts = []
+        try:
+            stream = self.groq_client.chat.completions.create(
+                model=self.LLM_MODEL,
+                messages=messages,
+                temperature=0.2,
+                max_tokens=max_tokens,
+                stream=True,
+                **stop_kwargs
+            )
+            for chunk in stream:
+                content = chunk.choices[0].delta.content
+                if content:
+                    parts.append(content)
+                    yield content
+        except Exception as e:
+            yield f"Error generating answer: {str(e)}"
+            return False
+        
+        self._store_answer(cache_key, "".join(parts))
+        return True
+    
+    def generate_answer_v1(self, query: str, context_docs: List[Document]) -> str:
+        """
+        Version 1: Initial prompt (basic, direct)
+        
+        Prompt Design Principles:
+        - Clear role definition
+        - Explicit instruction to use only provided context
+        - Fallback for missing information
+        """
+        return self._complete(self._build_messages_v1(query, context_docs), max_tokens=1000)
     
     def generate_answer_v2(self, query: str, context_docs: List[Document]) -> str:
         """
@@ -246,59 +1443,41 @@ Answer:"""
         4. Graceful degradation for partial information
         5. XML tags for clear section separation
         """
-        if not self.groq_client:
-            return "Error: GROQ_API_KEY not set. Cannot generate answer."
-        
-        # Prepare context with clear labeling
-        context = "\n\n".join([
-            f"<excerpt id=\"{i+1}\" page=\"{doc.page_num}\">\n{doc.text}\n</excerpt>"
-            for i, doc in enumerate(context_docs)
-        ])
-        
-        prompt = f"""You are a precise policy assistant. Your task is to answer questions about company policies using ONLY the provided excerpts.
-
-<policy_excerpts>
-{context}
-</policy_excerpts>
-
-<question>
-{query}
-</question>
-
-<instructions>
-1. CAREFULLY read all excerpts
-2. ONLY use information explicitly stated in the excerpts
-3. If the answer requires information not in the excerpts, state this clearly
-4. Cite the excerpt ID and page number for each piece of information
-5. Use the structured format below
-</instructions>
-
-<output_format>
-**Policy Answer:**
-[Your answer here, with citations like (Excerpt 1, Page 5)]
-
-**Confidence:** [High/Medium/Low]
-- High: Answer fully supported by excerpts
-- Medium: Partial information available
-- Low: Insufficient information
-
-**Source:** [List excerpt IDs and page numbers used]
-
-**Note:** [Any important caveats or missing information]
-</output_format>
-
-Please answer the question now:"""
+        return self._complete(self._build_messages_v2(query, context_docs), max_tokens=1500)
+    
+    def generate(self, query: str, context_docs: List[Document], prompt_version: int = 2) -> str:
+        """Generate an answer from already-retrieved context with the chosen prompt version"""
+        if prompt_version == 1:
+            return self.generate_answer_v1(query, context_docs)
+        return self.generate_answer_v2(query, context_docs)
+    
+    def generate_answer_v1_stream(self, query: str, context_docs: List[Document],
+                                  stop: Optional[List[str]] = None) -> Generator[str, None, bool]:
+        """Streaming generate_answer_v1: yields answer text from the first token on"""
+        return self._complete_stream(self._build_messages_v1(query, context_docs), max_tokens=1000, stop=stop)
+    
+    def generate_answer_v2_stream(self, query: str, context_docs: List[Document],
+                                  stop: Optional[List[str]] = None) -> Generator[str, None, bool]:
+        """
+        Streaming generate_answer_v2: yields answer text from the first token on
         
-        try:
-            completion = self.groq_client.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2,
-                max_tokens=1500
-            )
-            return completion.choices[0].message.content
-        except Exception as e:
-            return f"Error generating answer: {str(e)}"
+        Pass stop=V2_STOP_BEFORE_NOTE to end the answer before its "Note" section
+        when only the policy answer and citations are needed.
+        """
+        return self._complete_stream(self._build_messages_v2(query, context_docs), max_tokens=1500, stop=stop)
+    
+    def generate_stream(self, query: str, context_docs: List[Document], prompt_version: int = 2,
+                        stop: Optional[List[str]] = None) -> Generator[str, None, bool]:
+        """Streaming counterpart of generate"""
+        if prompt_version == 1:
+            return self.generate_answer_v1_stream(query, context_docs, stop)
+        return self.generate_answer_v2_stream(query, context_docs, stop)
+    
+    async def agenerate_answer(self, query: str, context_docs: List[Document], prompt_version: int = 2) -> str:
+        """Async counterpart of generate_answer_v1/v2 using the AsyncGroq client"""
+        if prompt_version == 1:
+            return await self._acomplete(self._build_messages_v1(query, context_docs), max_tokens=1000)
+        return await self._acomplete(self._build_messages_v2(query, context_docs), max_tokens=1500)
     
     def answer_question(self, query: str, top_k: int = 3, prompt_version: int = 2) -> Dict:
         """
@@ -312,59 +1491,220 @@ Please answer the question now:"""
         Returns:
             Dictionary with answer, context, and metadata
         """
+        # Serve paraphrases of earlier questions without hitting the LLM
+        cached, query_vector = self._check_cache(query, prompt_version, top_k)
+        if cached is not None:
+            return cached
+        
         # Retrieve relevant documents
         retrieved_docs = self.retrieve(query, top_k)
         
-        # Check if we have relevant results (threshold: distance < 1.5)
-        if not retrieved_docs or retrieved_docs[0][1] > 1.5:
-            return {
-                "query": query,
-                "answer": "I couldn't find relevant information in the policy documents to answer this question. This topic may not be covered in the available policies.",
-                "context": [],
-                "confidence": "low",
-                "retrieval_scores": []
-            }
-        
-        # Extract documents
-        docs = [doc for doc, _ in retrieved_docs]
-        scores = [score for _, score in retrieved_docs]
+        if not self._is_relevant(retrieved_docs):
+            response = self._no_answer_response(query)
+        else:
+            # Generate answer
+            docs = [doc for doc, _ in retrieved_docs]
+            answer = self.generate(query, docs, prompt_version)
+            response = self._build_response(query, answer, retrieved_docs)
         
-        # Generate answer
-        if prompt_version == 1:
-            answer = self.generate_answer_v1(query, docs)
+        self._cache_response(query_vector, prompt_version, top_k, response)
+        return response
+    
+    async def aanswer_question(self, query: str, top_k: int = 3, prompt_version: int = 2) -> Dict:
+        """
+        Async end-to-end question answering
+        
+        Same contract as answer_question, but awaits the LLM call so that many
+        questions can be answered concurrently with asyncio.gather.
+        """
+        cached, query_vector = self._check_cache(query, prompt_version, top_k)
+        if cached is not None:
+            return cached
+        
+        retrieved_docs = self.retrieve(query, top_k)
+        
+        if not self._is_relevant(retrieved_docs):
+            response = self._no_answer_response(query)
         else:
-            answer = self.generate_answer_v2(query, docs)
+            docs = [doc for doc, _ in retrieved_docs]
+            answer = await self.agenerate_answer(query, docs, prompt_version)
+            response = self._build_response(query, answer, retrieved_docs)
+        
+        self._cache_response(query_vector, prompt_version, top_k, response)
+        return response
+    
+    async def answer_questions_batch(self, queries: List[str], top_k: int = 3, prompt_version: int = 2,
+                                     semaphore: Optional[asyncio.Semaphore] = None) -> List[Dict]:
+        """
+        Answer many questions concurrently
+        
+        Retrieval for all questions runs as one batched search; the LLM calls
+        then overlap, with at most LLM_CONCURRENCY in flight to stay within
+        Groq's rate limits.
+        
+        Args:
+            semaphore: Limit shared with other batches running at the same time
+                       (defaults to a new one allowing LLM_CONCURRENCY calls)
+        
+        Returns:
+            One answer_question dictionary per query, in order
+        """
+        self.retrieve_batch(queries, top_k)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.LLM_CONCURRENCY)
+        
+        async def bounded_answer(query: str) -> Dict:
+            async with semaphore:
+                return await self.aanswer_question(query, top_k, prompt_version)
+        
+        return await asyncio.gather(*[bounded_answer(query) for query in queries])
+    
+    def stream_answer(self, query: str, top_k: int = 3, prompt_version: int = 2,
+                      stop: Optional[List[str]] = None) -> Tuple[Dict, Iterator[str]]:
+        """
+        End-to-end question answering with a streamed answer
+        
+        Retrieval runs up front; the LLM answer is yielded piece by piece so it
+        can be shown as soon as the first tokens arrive. With `stop`, generation
+        ends early at any of the given sequences (such answers are not added to
+        the semantic cache, since they are deliberately partial).
+        
+        Returns:
+            (response, tokens): the answer_question dictionary with an empty
+            "answer", and an iterator over answer text. Once the iterator is
+            exhausted, response["answer"] holds the full answer.
+        """
+        cached, query_vector = self._check_cache(query, prompt_version, top_k)
+        if cached is not None:
+            return cached, iter([cached["answer"]])
+        
+        retrieved_docs = self.retrieve(query, top_k)
+        
+        if not self._is_relevant(retrieved_docs):
+            response = self._no_answer_response(query)
+            self._cache_response(query_vector, prompt_version, top_k, response)
+            return response, iter([response["answer"]])
+        
+        docs = [doc for doc, _ in retrieved_docs]
+        response = self._build_response(query, "", retrieved_docs)
+        
+        def tokens() -> Iterator[str]:
+            parts = []
+            completed = yield from _collect(self.generate_stream(query, docs, prompt_version, stop), parts)
+            response["answer"] = "".join(parts)
+            # Only complete answers are cached; a stream that failed part-way would
+            # otherwise be served from the semantic cache on every later run
+            if completed and not stop:
+                self._cache_response(query_vector, prompt_version, top_k, response)
+        
+        return response, tokens()
+    
+    def _check_cache(self, query: str, prompt_version: int, top_k: int) -> Tuple[Optional[Dict], Optional[np.ndarray]]:
+        """Look the query up in the semantic cache, returning (cached response, query vector)"""
+        if self.semantic_cache is None:
+            return None, None
+        
+        query_vector = self._embed_query(query)
+        cached = self.semantic_cache.lookup(query_vector, prompt_version, top_k)
+        if cached is not None:
+            cached = {**cached, "query": query}
+        return cached, query_vector
+    
+    def _cache_response(self, query_vector: Optional[np.ndarray], prompt_version: int, top_k: int, response: Dict):
+        """Store a response in the semantic cache (failed LLM calls are not cached)"""
+        if self.semantic_cache is None or query_vector is None:
+            return
+        if response["answer"].startswith("Error"):
+            return
+        self.semantic_cache.add(query_vector, prompt_version, top_k, response)
+    
+    def _is_relevant(self, retrieved_docs: List[Tuple[Document, float]]) -> bool:
+        """Check if the best result is similar enough to answer from"""
+        return bool(retrieved_docs) and retrieved_docs[0][1] >= self.MIN_RELEVANT_SIMILARITY
+    
+    def _no_answer_response(self, query: str) -> Dict:
+        """Response returned when nothing relevant was retrieved"""
+        return {
+            "query": query,
+            "answer": "I couldn't find relevant information in the policy documents to answer this question. This topic may not be covered in the available policies.",
+            "context": [],
+            "confidence": "low",
+            "retrieval_scores": []
+        }
+    
+    def _build_response(self, query: str, answer: str, retrieved_docs: List[Tuple[Document, float]]) -> Dict:
+        """
+        Assemble the answer dictionary returned by answer_question
+        
+        Context entries reference chunks by source and chunk_id rather than
+        repeating their text; use get_chunk_text to resolve one.
+        """
+        scores = [score for _, score in retrieved_docs]
         
         return {
             "query": query,
             "answer": answer,
             "context": [
                 {
-                    "text": doc.text,
                     "page": doc.page_num,
+                    "source": doc.source,
                     "chunk_id": doc.chunk_id,
                     "relevance_score": float(score)
                 }
-                for doc, score in zip(docs, scores)
+                for doc, score in retrieved_docs
             ],
             "confidence": self._assess_confidence(scores),
             "retrieval_scores": scores
         }
     
     def _assess_confidence(self, scores: List[float]) -> str:
-        """Assess retrieval confidence based on similarity scores"""
+        """Assess retrieval confidence based on cosine similarity scores"""
         if not scores:
             return "low"
         
         best_score = scores[0]
-        if best_score < 0.5:
+        if best_score > self.HIGH_CONFIDENCE_SIMILARITY:
             return "high"
-        elif best_score < 1.0:
+        elif best_score > self.MEDIUM_CONFIDENCE_SIMILARITY:
             return "medium"
         else:
             return "low"
 
 
+def load_or_build_index(pdf_path: str, processor: DocumentProcessor, rag: RAGPipeline,
+                        cache_dir: str = ".rag_cache") -> int:
+    """
+    Load chunks, embeddings and FAISS index from disk, or build and cache them
+    
+    The cache key covers the PDF's size and modification time plus every setting
+    that changes the result (PDF extractor, chunking, embedding model, quantization, GPU index), so an
+    unchanged PDF skips parsing and embedding entirely on warm starts. The key
+    is set as `rag.index_key` once the chunks are loaded, for the semantic cache.
+    
+    Returns:
+        The number of chunks now loaded into `rag` (chunk texts stay in its blob;
+        use `rag.documents` to materialize them)
+    """
+    stat = os.stat(pdf_path)
+    extractor = "pymupdf" if pymupdf is not None else "PyPDF2"
+    key_source = (f"{stat.st_size}:{stat.st_mtime_ns}:{extractor}:{processor.chunk_size}:{processor.overlap}:"
+                  f"{rag.model_name}:{rag.onnx_model_dir}:{rag.quantization}:{rag.gpu_resources is not None}")
+    key = hashlib.blake2b(key_source.encode(), digest_size=16).hexdigest()
+    entry_dir = os.path.join(cache_dir, key)
+    
+    if RAGPipeline.is_saved(entry_dir):
+        rag.load(entry_dir)
+        print(f"✓ Loaded {rag._num_documents()} documents from index cache")
+    else:
+        # Stream pages -> chunks -> batched embeddings instead of materializing the whole text
+        rag.add_documents(processor.chunk_pages(processor.iter_pages(pdf_path), source=pdf_path))
+        rag.save(entry_dir)
+    
+    # Set after loading, since installing chunks clears the key
+    rag.index_key = key
+    return rag._num_documents()
+
+
 class Evaluator:
     """Evaluate RAG system performance"""
     
@@ -431,9 +1771,13 @@ class Evaluator:
         print("\n" + "="*80)
     
     def save_results(self, filepath: str):
-        """Save evaluation results to JSON"""
-        with open(filepath, 'w') as f:
-            json.dump(self.results, f, indent=2)
+        """Save evaluation results to JSON (once, after all answers are evaluated)"""
+        if orjson is not None:
+            with open(filepath, 'wb') as f:
+                f.write(orjson.dumps(self.results, option=orjson.OPT_INDENT_2))
+        else:
+            with open(filepath, 'w') as f:
+                json.dump(self.results, f, indent=2)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,253 @@
+"""
+Answer generation and caching tests with fake Groq clients
+
+Run with: python -m unittest discover tests
+"""
+
+import os
+import sys
+import asyncio
+import sqlite3
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import rag_system
+from rag_system import RAGPipeline
+from test_retrieval import make_documents, make_pipeline
+
+
+def stream_chunk(content):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+
+class FakeCompletions:
+    """Streams the given pieces, then raises `error` if one is set"""
+
+    def __init__(self, pieces, error=None):
+        self.pieces = pieces
+        self.error = error
+
+    def create(self, **kwargs):
+        def stream():
+            for piece in self.pieces:
+                yield stream_chunk(piece)
+            if self.error is not None:
+                raise self.error
+        return stream()
+
+
+def fake_client(pieces, error=None):
+    return SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(pieces, error)))
+
+
+class StreamAnswerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.rag = make_pipeline()
+        self.rag.add_documents(make_documents(20))
+        self.rag.enable_semantic_cache(cache_path=os.path.join(self.tmp.name, "cache.sqlite3"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_failed_stream_is_not_cached(self):
+        self.rag.groq_client = fake_client(["Partial answer "], ConnectionError("connection reset"))
+
+        response, tokens = self.rag.stream_answer("rule3 refund policy")
+        list(tokens)
+
+        self.assertIn("Error generating answer", response["answer"])
+        self.assertEqual(len(self.rag.semantic_cache), 0)
+
+    def test_complete_stream_is_cached(self):
+        self.rag.groq_client = fake_client(["Full ", "answer"])
+
+        response, tokens = self.rag.stream_answer("rule3 refund policy")
+        list(tokens)
+
+        self.assertEqual(response["answer"], "Full answer")
+        self.assertEqual(len(self.rag.semantic_cache), 1)
+        entry = response["context"][0]
+        self.assertIn("rule3", self.rag.get_chunk_text(entry["source"], entry["chunk_id"]))
+
+
+class CountingAsyncCompletions:
+    """Async completions that record the most requests ever in flight at once"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def create(self, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.001)
+        self.in_flight -= 1
+        message = SimpleNamespace(content="answer")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+class AnswerBatchTest(unittest.TestCase):
+
+    def test_shared_semaphore_limits_concurrent_batches(self):
+        rag = make_pipeline()
+        rag.add_documents(make_documents(20))
+        completions = CountingAsyncCompletions()
+        rag.async_groq_client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+        queries = [f"rule{i} refund" for i in range(3 * rag.LLM_CONCURRENCY)]
+
+        async def run_both():
+            semaphore = asyncio.Semaphore(rag.LLM_CONCURRENCY)
+            return await asyncio.gather(
+                rag.answer_questions_batch(queries, prompt_version=1, semaphore=semaphore),
+                rag.answer_questions_batch(queries, prompt_version=2, semaphore=semaphore)
+            )
+
+        responses_v1, responses_v2 = asyncio.run(run_both())
+
+        self.assertEqual(len(responses_v1), len(queries))
+        self.assertEqual(len(responses_v2), len(queries))
+        self.assertEqual(completions.max_in_flight, rag.LLM_CONCURRENCY)
+
+
+
+class StatusError(Exception):
+    """Stand-in for groq.APIStatusError"""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"Error code: {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+class FlakyAsyncCompletions:
+    """Raises the given errors on successive calls, then answers"""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        message = SimpleNamespace(content="answer")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+class RetryTest(unittest.TestCase):
+
+    def complete(self, errors):
+        rag = make_pipeline()
+        completions = FlakyAsyncCompletions(errors)
+        rag.async_groq_client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+        delays = []
+
+        async def record_sleep(delay):
+            delays.append(delay)
+
+        with mock.patch("asyncio.sleep", record_sleep):
+            answer = asyncio.run(rag._acomplete([{"role": "user", "content": "question"}], 100))
+        return answer, completions.calls, delays
+
+    def test_server_errors_are_retried_with_backoff(self):
+        answer, calls, delays = self.complete([StatusError(503), StatusError(500), StatusError(408)])
+
+        self.assertEqual(answer, "answer")
+        self.assertEqual(calls, 4)
+        self.assertEqual(delays, [1.0, 2.0, 4.0])
+
+    def test_retry_after_header_is_honoured(self):
+        answer, calls, delays = self.complete([StatusError(429, {"retry-after": "7"}),
+                                               StatusError(429, {"retry-after": "3600"})])
+
+        self.assertEqual(answer, "answer")
+        self.assertEqual(delays, [7.0, 60.0])
+
+    def test_client_errors_are_not_retried(self):
+        answer, calls, delays = self.complete([StatusError(400)])
+
+        self.assertTrue(answer.startswith("Error generating answer"))
+        self.assertEqual(calls, 1)
+        self.assertEqual(delays, [])
+
+    def test_gives_up_after_max_retries(self):
+        answer, calls, delays = self.complete([StatusError(502)] * 10)
+
+        self.assertTrue(answer.startswith("Error generating answer"))
+        self.assertEqual(calls, RAGPipeline.LLM_MAX_RETRIES + 1)
+
+    @unittest.skipUnless(hasattr(rag_system, "APIConnectionError"), "groq not installed")
+    def test_connection_errors_are_retried(self):
+        import httpx
+        error = rag_system.APIConnectionError(request=httpx.Request("POST", "https://api.groq.com"))
+
+        answer, calls, delays = self.complete([error])
+
+        self.assertEqual(answer, "answer")
+        self.assertEqual(delays, [1.0])
+
+
+class SemanticCacheKeyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.tmp.name, "cache.sqlite3")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def answer_with_cache(self, index_key, generated):
+        rag = make_pipeline()
+        rag.add_documents(make_documents(20))
+        rag.index_key = index_key
+        rag.enable_semantic_cache(cache_path=self.cache_path)
+        rag.groq_client = fake_client([generated])
+        response, tokens = rag.stream_answer("rule3 refund policy")
+        list(tokens)
+        return response["answer"]
+
+    def test_entries_only_load_for_same_index_key(self):
+        self.answer_with_cache("document-v1", "first answer")
+
+        self.assertEqual(self.answer_with_cache("document-v1", "second answer"), "first answer")
+        self.assertEqual(self.answer_with_cache("document-v2", "third answer"), "third answer")
+
+    def test_unkeyed_pipelines_do_not_share_answers(self):
+        self.assertEqual(self.answer_with_cache(None, "first answer"), "first answer")
+
+        self.assertEqual(self.answer_with_cache(None, "second answer"), "second answer")
+        self.assertFalse(os.path.exists(self.cache_path))
+
+    def test_replacing_documents_drops_cached_answers(self):
+        self.answer_with_cache("document-v1", "first answer")
+        rag = make_pipeline()
+        rag.add_documents(make_documents(20))
+        rag.index_key = "document-v1"
+        rag.enable_semantic_cache(cache_path=self.cache_path)
+        self.assertEqual(len(rag.semantic_cache), 1)
+
+        rag.add_documents(make_documents(5, source="other.pdf"))
+
+        self.assertIsNone(rag.index_key)
+        self.assertEqual(len(rag.semantic_cache), 0)
+        rag.index_key = "document-v1"
+        self.assertEqual(len(rag.semantic_cache), 1)
+
+    def test_untagged_store_is_migrated(self):
+        with sqlite3.connect(self.cache_path) as db:
+            db.execute("CREATE TABLE answers ("
+                       "prompt_version INTEGER, top_k INTEGER, query TEXT, embedding BLOB, response TEXT)")
+
+        self.answer_with_cache("document-v1", "first answer")
+
+        self.assertEqual(self.answer_with_cache("document-v1", "second answer"), "first answer")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+"""
+Retrieval tests with a small deterministic embedder (no model download needed)
+
+Run with: python -m unittest discover tests
+"""
+
+import os
+import sys
+import hashlib
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.pop("GROQ_API_KEY", None)
+
+import rag_system
+from rag_system import Document, RAGPipeline
+
+
+class HashingEmbedder:
+    """Bag-of-words embedder with the parts of the SentenceTransformer API the pipeline uses"""
+
+    DIMENSION = 64
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False,
+               convert_to_numpy=True, normalize_embeddings=False):
+        embeddings = np.zeros((len(texts), self.DIMENSION), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                embeddings[row, int(hashlib.md5(word.encode()).hexdigest(), 16) % self.DIMENSION] += 1
+        if normalize_embeddings:
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings
+
+    def get_sentence_embedding_dimension(self):
+        return self.DIMENSION
+
+
+def make_pipeline(**kwargs) -> RAGPipeline:
+    rag_system._MODEL_CACHE[("hashing-embedder", "cpu")] = HashingEmbedder()
+    return RAGPipeline(model_name="hashing-embedder", device="cpu", **kwargs)
+
+
+def make_documents(n: int, source: str = "policy.pdf") -> list:
+    return [
+        Document(text=f"policy rule{i} refund shipping clause{i % 7}", chunk_id=i, page_num=i // 5 + 1, source=source)
+        for i in range(n)
+    ]
+
+
+class RetrieveBatchTest(unittest.TestCase):
+
+    def test_batch_larger_than_caches(self):
+        rag = make_pipeline()
+        rag.add_documents(make_documents(40))
+        queries = [f"rule{i % 40} question {i}" for i in range(RAGPipeline.QUERY_EMBEDDING_CACHE_SIZE + 100)]
+
+        results = rag.retrieve_batch(queries, top_k=3)
+
+        self.assertEqual(len(results), len(queries))
+        self.assertTrue(all(len(hits) == 3 for hits in results))
+        self.assertEqual(results[5], rag.retrieve(queries[5], top_k=3))
+
+    def test_batch_matches_single_queries(self):
+        rag = make_pipeline()
+        rag.add_documents(make_documents(40))
+        queries = ["rule3 refund", "clause5 shipping", "rule3 refund", "unrelated words"]
+
+        batched = rag.retrieve_batch(queries, top_k=3)
+        fresh = make_pipeline()
+        fresh.add_documents(make_documents(40))
+        single = [fresh.retrieve(query, top_k=3) for query in queries]
+
+        self.assertEqual(
+            [[(doc.chunk_id, round(score, 5)) for doc, score in hits] for hits in batched],
+            [[(doc.chunk_id, round(score, 5)) for doc, score in hits] for hits in single]
+        )
+
+
+class ChunkLookupTest(unittest.TestCase):
+
+    def test_same_chunk_id_in_two_sources(self):
+        rag = make_pipeline()
+        rag.add_documents(make_documents(10, "handbook.pdf") + [
+            Document(text=f"returns appendix section{i}", chunk_id=i, page_num=1, source="appendix.pdf")
+            for i in range(3)
+        ])
+
+        self.assertEqual(rag.get_chunk_text("handbook.pdf", 2), "policy rule2 refund shipping clause2")
+        self.assertEqual(rag.get_chunk_text("appendix.pdf", 2), "returns appendix section2")
+        with self.assertRaises(KeyError):
+            rag.get_chunk_text("appendix.pdf", 5)
+
+    def test_lookup_follows_replaced_documents(self):
+        rag = make_pipeline()
+        rag.add_documents(make_documents(10))
+        self.assertEqual(rag.get_chunk_text("policy.pdf", 4), "policy rule4 refund shipping clause4")
+
+        rag.add_documents([Document(text="new chunk four", chunk_id=4, page_num=1, source="policy.pdf")])
+
+        self.assertEqual(rag.get_chunk_text("policy.pdf", 4), "new chunk four")
+        with self.assertRaises(KeyError):
+            rag.get_chunk_text("policy.pdf", 3)
+
+class ThreadPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        saved = rag_system._NUM_THREADS
+        self.addCleanup(setattr, rag_system, "_NUM_THREADS", saved)
+        rag_system._NUM_THREADS = None
+        patcher = mock.patch.object(rag_system.faiss, "omp_set_num_threads")
+        self.omp_set_num_threads = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_first_default_pipeline_uses_available_cpus(self):
+        make_pipeline()
+        make_pipeline()
+
+        self.omp_set_num_threads.assert_called_once_with(rag_system.available_cpus())
+
+    def test_default_pipeline_keeps_explicit_thread_count(self):
+        make_pipeline(num_threads=2)
+        make_pipeline()
+
+        self.omp_set_num_threads.assert_called_once_with(2)
+        self.assertEqual(rag_system._NUM_THREADS, 2)
+
+class SaveLoadTest(unittest.TestCase):
+
+    def assert_round_trip(self, n_documents, quantization=None, **thresholds):
+        """Save and reload a pipeline, check retrieval is unchanged, return the loaded index type"""
+        rag = make_pipeline(quantization=quantization)
+        for name, value in thresholds.items():
+            setattr(rag, name, value)
+        rag.add_documents(make_documents(n_documents))
+        queries = ["rule3 refund", "clause5 shipping", "policy rule42"]
+        expected = [[doc.chunk_id for doc, _ in hits] for hits in rag.retrieve_batch(queries, top_k=3)]
+
+        with tempfile.TemporaryDirectory() as path:
+            rag.save(path)
+            loaded = make_pipeline(quantization=quantization)
+            for name, value in thresholds.items():
+                setattr(loaded, name, value)
+            loaded.load(path)
+            results = [[doc.chunk_id for doc, _ in hits] for hits in loaded.retrieve_batch(queries, top_k=3)]
+            index_type = type(loaded.index).__name__
+            # The float16 side copy is only kept (and saved) where search rescores with it
+            rescoring = index_type in ("IndexIVFPQ", "IndexBinaryHNSW")
+            self.assertEqual(os.path.exists(os.path.join(path, "embeddings.npy")), rescoring)
+            self.assertEqual(loaded.embeddings is not None, rescoring)
+            self.assertEqual(rag.embeddings is not None, rescoring)
+
+        self.assertEqual(results, expected)
+        return index_type
+
+    def test_flat(self):
+        self.assertEqual(self.assert_round_trip(40), "IndexFlatIP")
+
+    def test_hnsw(self):
+        self.assertEqual(self.assert_round_trip(60, FLAT_INDEX_MAX_SIZE=10), "IndexHNSWFlat")
+
+    def test_ivfpq(self):
+        index_type = self.assert_round_trip(400, FLAT_INDEX_MAX_SIZE=10, IVFPQ_MIN_SIZE=100)
+        self.assertEqual(index_type, "IndexIVFPQ")
+
+    def test_binary(self):
+        self.assertEqual(self.assert_round_trip(40, quantization="binary"), "IndexBinaryHNSW")
+
+
+if __name__ == "__main__":
+    unittest.main()